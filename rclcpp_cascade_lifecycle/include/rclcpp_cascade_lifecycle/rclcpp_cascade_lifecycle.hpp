@@ -17,7 +17,10 @@
 
 #include <set>
 #include <map>
+#include <mutex>
 #include <string>
+#include <unordered_set>
+#include <vector>
 
 #include "rclcpp/node_options.hpp"
 #include "rclcpp_lifecycle/lifecycle_node.hpp"
@@ -67,10 +70,23 @@ public:
   void remove_activation(const std::string & node_name);
   void clear_activation();
 
-  const std::set<std::string> & get_activators() const {return activators_;}
-  const std::set<std::string> & get_activations() const {return activations_;}
-  const std::map<std::string, uint8_t> & get_activators_state() const
+  // The getters return copies taken under the lock: a reference would let
+  // a user thread read the container while an executor thread mutates it.
+  std::set<std::string> get_activators() const
   {
+    std::lock_guard<std::recursive_mutex> lock(mutex_);
+    return activators_;
+  }
+
+  std::set<std::string> get_activations() const
+  {
+    std::lock_guard<std::recursive_mutex> lock(mutex_);
+    return activations_;
+  }
+
+  std::map<std::string, uint8_t> get_activators_state() const
+  {
+    std::lock_guard<std::recursive_mutex> lock(mutex_);
     return activators_state_;
   }
 
@@ -97,20 +113,60 @@ private:
   rclcpp_lifecycle::LifecyclePublisher<cascade_lifecycle_msgs::msg::Activation>::SharedPtr
     activations_pub_;
 
+  rclcpp::CallbackGroup::SharedPtr callback_group_;
   rclcpp::Subscription<cascade_lifecycle_msgs::msg::Activation>::SharedPtr activations_sub_;
   rclcpp::Subscription<cascade_lifecycle_msgs::msg::State>::SharedPtr states_sub_;
 
   rclcpp::TimerBase::SharedPtr timer_;
 
+  std::string name_;
+
+  // Namespace of this node with a trailing slash, prepended to activator
+  // names when checking presence in the graph.
+  std::string ns_prefix_;
+
+  rclcpp::Event::SharedPtr graph_event_;
+  std::unordered_set<std::string> graph_node_names_;
+  bool graph_node_names_valid_ {false};
+
+  // Protects activators_, activations_, activators_state_, node_states_,
+  // the activator counters, and the publish-side state in state_msg_ and
+  // last_state_published_ when the subscriptions run in the reentrant
+  // callback group under a multi-threaded executor. Recursive because a
+  // lifecycle callback fired while the lock is held may call back into the
+  // public API. Mutable so the const getters can lock it.
+  mutable std::recursive_mutex mutex_;
+
   std::set<std::string> activators_;
   std::set<std::string> activations_;
   std::map<std::string, uint8_t> activators_state_;
 
+  // Last state heard from every peer on the states topic, so an ADD can be
+  // seeded without waiting for the activator to publish again.
+  std::map<std::string, uint8_t> node_states_;
+
+  size_t n_activators_active_ {0};
+  size_t n_activators_inactive_ {0};
+
+  uint8_t last_state_published_ {lifecycle_msgs::msg::State::PRIMARY_STATE_UNKNOWN};
+
+  cascade_lifecycle_msgs::msg::State state_msg_;
+  cascade_lifecycle_msgs::msg::Activation activation_msg_;
+
+  // Activation messages queued during one API call and published together.
+  std::vector<cascade_lifecycle_msgs::msg::Activation> activation_outbox_;
+
+  void set_activator_state(const std::string & node_name, uint8_t state);
+  void erase_activator_state(const std::string & node_name);
+  void publish_state(uint8_t state, bool force = false);
+  void enqueue_activation(uint8_t operation, const std::string & node_name);
+  void flush_activation_outbox();
+
   void activations_callback(const cascade_lifecycle_msgs::msg::Activation::SharedPtr msg);
   void states_callback(const cascade_lifecycle_msgs::msg::State::SharedPtr msg);
   void update_state();
 
-  void timer_callback();
+  void gc_callback();
 };
 
 }  // namespace rclcpp_cascade_lifecycle
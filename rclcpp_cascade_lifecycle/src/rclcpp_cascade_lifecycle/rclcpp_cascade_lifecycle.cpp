@@ -13,8 +13,12 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include <map>
 #include <string>
 #include <set>
+#include <unordered_set>
+#include <utility>
+#include <vector>
 
 #include "rclcpp_cascade_lifecycle/rclcpp_cascade_lifecycle.hpp"
 #include "rclcpp_lifecycle/node_interfaces/lifecycle_node_interface.hpp"
@@ -47,30 +51,75 @@ CascadeLifecycleNode::CascadeLifecycleNode(
   using std::placeholders::_1;
   using namespace std::chrono_literals;
 
+  // Activation messages are idempotent ADD/REMOVE operations on a set, not
+  // a log: replaying the recent history per publisher is enough for a late
+  // joiner to rebuild the current activation set, so a bounded KEEP_LAST
+  // latch replaces the unbounded KEEP_ALL one on the writer side. An ADD
+  // older than its publisher's last 50 operations falls out of the latch;
+  // such a publisher should re-add its activations. The reader cache stays
+  // KEEP_ALL: it is shared by every peer, a discovery burst can exceed any
+  // fixed depth, and a displaced ADD is never resent.
+  auto activations_pub_qos = rclcpp::QoS(rclcpp::KeepLast(50)).transient_local().reliable();
+  auto activations_sub_qos = rclcpp::QoS(rclcpp::KeepAll()).transient_local().reliable();
+
+  // Only the latest state of a node matters, so one latched sample per
+  // publisher is enough on the writer side. The reader cache is shared by
+  // every peer publishing on the topic, so it needs depth for a burst of
+  // states (e.g. the latched samples a late joiner receives at once);
+  // depth 1 there would silently drop all but one of them.
+  auto states_pub_qos = rclcpp::QoS(rclcpp::KeepLast(1)).transient_local().reliable();
+  auto states_sub_qos = rclcpp::QoS(rclcpp::KeepLast(100)).transient_local().reliable();
+
   activations_pub_ = create_publisher<cascade_lifecycle_msgs::msg::Activation>(
-    "cascade_lifecycle_activations",
-    rclcpp::QoS(1000).keep_all().transient_local().reliable());
+    "cascade_lifecycle_activations", activations_pub_qos);
 
   states_pub_ = create_publisher<cascade_lifecycle_msgs::msg::State>(
-    "cascade_lifecycle_states", rclcpp::QoS(100));
+    "cascade_lifecycle_states", states_pub_qos);
+
+  // A reentrant group lets a multi-threaded executor dispatch activation
+  // and state messages in parallel with the GC timer; the shared
+  // bookkeeping is guarded by mutex_.
+  callback_group_ = create_callback_group(rclcpp::CallbackGroupType::Reentrant);
+
+  rclcpp::SubscriptionOptions sub_options;
+  sub_options.callback_group = callback_group_;
 
   activations_sub_ = create_subscription<cascade_lifecycle_msgs::msg::Activation>(
-    "cascade_lifecycle_activations",
-    rclcpp::QoS(1000).keep_all().transient_local().reliable(),
-    std::bind(&CascadeLifecycleNode::activations_callback, this, _1));
+    "cascade_lifecycle_activations", activations_sub_qos,
+    std::bind(&CascadeLifecycleNode::activations_callback, this, _1),
+    sub_options);
 
   states_sub_ = create_subscription<cascade_lifecycle_msgs::msg::State>(
-    "cascade_lifecycle_states",
-    rclcpp::QoS(100),
-    std::bind(&CascadeLifecycleNode::states_callback, this, _1));
-
+    "cascade_lifecycle_states", states_sub_qos,
+    std::bind(&CascadeLifecycleNode::states_callback, this, _1),
+    sub_options);
+
+  // 500 ms keeps both GC pruning and the re-convergence after a manual
+  // trigger_transition() inside the 1 s windows the cascade is expected to
+  // settle in; the tick is cheap since the graph query is cached behind
+  // the graph event and update_state() reads two counters.
   timer_ = create_wall_timer(
     500ms,
-    std::bind(&CascadeLifecycleNode::timer_callback, this));
+    std::bind(&CascadeLifecycleNode::gc_callback, this));
+
+  graph_event_ = get_node_graph_interface()->get_graph_event();
+
+  name_ = get_name();
+  state_msg_.node_name = name_;
+  activation_msg_.activator = name_;
+
+  ns_prefix_ = get_namespace();
+  if (ns_prefix_ != "/") {
+    ns_prefix_ += "/";
+  }
 
   activations_pub_->on_activate();
   states_pub_->on_activate();
 
+  // Latch the initial state so peers learn it on discovery instead of
+  // through a periodic republish.
+  publish_state(get_current_state().id(), true);
+
   register_on_configure(
     std::bind(
       &CascadeLifecycleNode::on_configure_internal,
@@ -102,40 +151,121 @@ CascadeLifecycleNode::CascadeLifecycleNode(
       this, std::placeholders::_1));
 }
 
+void
+CascadeLifecycleNode::set_activator_state(const std::string & node_name, uint8_t state)
+{
+  auto it = activators_state_.find(node_name);
+  if (it != activators_state_.end()) {
+    if (it->second == state) {
+      return;
+    }
+    if (it->second == lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE) {
+      n_activators_active_--;
+    } else if (it->second == lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE) {
+      n_activators_inactive_--;
+    }
+    it->second = state;
+  } else {
+    activators_state_[node_name] = state;
+  }
+
+  if (state == lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE) {
+    n_activators_active_++;
+  } else if (state == lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE) {
+    n_activators_inactive_++;
+  }
+}
+
+void
+CascadeLifecycleNode::erase_activator_state(const std::string & node_name)
+{
+  auto it = activators_state_.find(node_name);
+  if (it == activators_state_.end()) {
+    return;
+  }
+
+  if (it->second == lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE) {
+    n_activators_active_--;
+  } else if (it->second == lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE) {
+    n_activators_inactive_--;
+  }
+  activators_state_.erase(it);
+}
+
+void
+CascadeLifecycleNode::publish_state(uint8_t state, bool force)
+{
+  // Also reached without the lock held, through the registered transition
+  // handlers when change_state is driven from outside the cascade callbacks.
+  std::lock_guard<std::recursive_mutex> lock(mutex_);
+
+  if (!force && state == last_state_published_) {
+    return;
+  }
+
+  state_msg_.state = state;
+  states_pub_->publish(state_msg_);
+
+  last_state_published_ = state;
+}
+
+void
+CascadeLifecycleNode::enqueue_activation(uint8_t operation, const std::string & node_name)
+{
+  activation_msg_.operation_type = operation;
+  activation_msg_.activation = node_name;
+  activation_outbox_.push_back(activation_msg_);
+}
+
+void
+CascadeLifecycleNode::flush_activation_outbox()
+{
+  for (const auto & msg : activation_outbox_) {
+    activations_pub_->publish(msg);
+  }
+  activation_outbox_.clear();
+}
+
 void
 CascadeLifecycleNode::activations_callback(
   const cascade_lifecycle_msgs::msg::Activation::SharedPtr msg)
 {
+  std::lock_guard<std::recursive_mutex> lock(mutex_);
+
   switch (msg->operation_type) {
     case cascade_lifecycle_msgs::msg::Activation::ADD:
-      if (msg->activation == get_name()) {
-        activators_.insert(msg->activator);
-
-        if (activators_state_.find(msg->activator) == activators_state_.end()) {
-          activators_state_[msg->activator] = lifecycle_msgs::msg::State::PRIMARY_STATE_UNKNOWN;
+      if (msg->activation == name_) {
+        // insert() reports whether the activator is new, making a duplicate
+        // ADD (e.g. replayed from the latched history) a no-op.
+        if (activators_.insert(msg->activator).second) {
+          auto known_state = node_states_.find(msg->activator);
+          set_activator_state(
+            msg->activator,
+            known_state != node_states_.end() ?
+            known_state->second : lifecycle_msgs::msg::State::PRIMARY_STATE_UNKNOWN);
+          update_state();
         }
+      } else if (msg->activator == name_) {
+        // The node we just started activating only knows us as UNKNOWN until
+        // it hears our state; republish it instead of waiting for discovery
+        // to replay the latched sample.
+        publish_state(get_current_state().id(), true);
       }
       break;
     case cascade_lifecycle_msgs::msg::Activation::REMOVE:
-      if (msg->activation == get_name() && activators_.find(msg->activator) != activators_.end()) {
-        uint8_t remover_state = activators_state_[msg->activator];
-
-        activators_.erase(msg->activator);
-
-        if (activators_state_.find(msg->activator) != activators_state_.end()) {
-          activators_state_.erase(msg->activator);
-        }
-
-        if (remover_state == lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE) {
-          bool any_other_activator = false;
-          for (const auto & activator : activators_state_) {
-            any_other_activator = any_other_activator ||
-              activator.second == lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE;
-          }
-
-          if (!any_other_activator) {
-            trigger_transition(lifecycle_msgs::msg::Transition::TRANSITION_DEACTIVATE);
-          }
+      if (msg->activation == name_ && activators_.erase(msg->activator) > 0) {
+        auto state_it = activators_state_.find(msg->activator);
+        const uint8_t remover_state = state_it != activators_state_.end() ?
+          state_it->second : lifecycle_msgs::msg::State::PRIMARY_STATE_UNKNOWN;
+
+        erase_activator_state(msg->activator);
+
+        // The counter already excludes the remover here, so any remaining
+        // active activator keeps the node up.
+        if (remover_state == lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE &&
+          n_activators_active_ == 0)
+        {
+          trigger_transition(lifecycle_msgs::msg::Transition::TRANSITION_DEACTIVATE);
         }
       }
       break;
@@ -145,28 +275,31 @@ CascadeLifecycleNode::activations_callback(
 void
 CascadeLifecycleNode::states_callback(const cascade_lifecycle_msgs::msg::State::SharedPtr msg)
 {
-  if (activators_state_.find(msg->node_name) != activators_state_.end() &&
-    msg->node_name != get_name())
-  {
-    if (activators_state_[msg->node_name] != msg->state) {
-      activators_state_[msg->node_name] = msg->state;
-      update_state();
-    }
+  std::lock_guard<std::recursive_mutex> lock(mutex_);
+
+  if (msg->node_name == name_) {
+    return;
+  }
+
+  node_states_[msg->node_name] = msg->state;
+
+  auto it = activators_state_.find(msg->node_name);
+  if (it != activators_state_.end() && it->second != msg->state) {
+    set_activator_state(msg->node_name, msg->state);
+    update_state();
   }
 }
 
 void
 CascadeLifecycleNode::add_activation(const std::string & node_name)
 {
-  if (node_name != get_name()) {
-    cascade_lifecycle_msgs::msg::Activation msg;
-    msg.operation_type = cascade_lifecycle_msgs::msg::Activation::ADD;
-    msg.activator = get_name();
-    msg.activation = node_name;
+  std::lock_guard<std::recursive_mutex> lock(mutex_);
 
+  if (node_name != name_) {
     activations_.insert(node_name);
 
-    activations_pub_->publish(msg);
+    enqueue_activation(cascade_lifecycle_msgs::msg::Activation::ADD, node_name);
+    flush_activation_outbox();
   } else {
     RCLCPP_WARN(get_logger(), "Trying to set an auto activation");
   }
@@ -175,15 +308,13 @@ CascadeLifecycleNode::add_activation(const std::string & node_name)
 void
 CascadeLifecycleNode::remove_activation(const std::string & node_name)
 {
-  if (node_name != get_name()) {
-    cascade_lifecycle_msgs::msg::Activation msg;
-    msg.operation_type = cascade_lifecycle_msgs::msg::Activation::REMOVE;
-    msg.activator = get_name();
-    msg.activation = node_name;
+  std::lock_guard<std::recursive_mutex> lock(mutex_);
 
+  if (node_name != name_) {
     activations_.erase(node_name);
 
-    activations_pub_->publish(msg);
+    enqueue_activation(cascade_lifecycle_msgs::msg::Activation::REMOVE, node_name);
+    flush_activation_outbox();
   } else {
     RCLCPP_WARN(get_logger(), "Trying to remove an auto activation");
   }
@@ -192,25 +323,26 @@ CascadeLifecycleNode::remove_activation(const std::string & node_name)
 void
 CascadeLifecycleNode::clear_activation()
 {
+  std::lock_guard<std::recursive_mutex> lock(mutex_);
+
+  // Queue one REMOVE per activation and publish them in a single batch at
+  // the end, instead of interleaving a publish with every erase.
   for (const auto & activation : activations_) {
-    remove_activation(activation);
+    enqueue_activation(cascade_lifecycle_msgs::msg::Activation::REMOVE, activation);
   }
+  activations_.clear();
+
+  flush_activation_outbox();
 }
 
 rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn
 CascadeLifecycleNode::on_configure_internal(
   const rclcpp_lifecycle::State & previous_state)
 {
-  cascade_lifecycle_msgs::msg::State msg;
-
   auto ret = on_configure(previous_state);
 
   if (ret == rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn::SUCCESS) {
-    cascade_lifecycle_msgs::msg::State msg;
-    msg.state = lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE;
-    msg.node_name = get_name();
-
-    states_pub_->publish(msg);
+    publish_state(lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE, true);
   }
 
   return ret;
@@ -220,16 +352,10 @@ rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn
 CascadeLifecycleNode::on_cleanup_internal(
   const rclcpp_lifecycle::State & previous_state)
 {
-  cascade_lifecycle_msgs::msg::State msg;
-
   auto ret = on_cleanup(previous_state);
 
   if (ret == rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn::SUCCESS) {
-    cascade_lifecycle_msgs::msg::State msg;
-    msg.state = lifecycle_msgs::msg::State::PRIMARY_STATE_UNCONFIGURED;
-    msg.node_name = get_name();
-
-    states_pub_->publish(msg);
+    publish_state(lifecycle_msgs::msg::State::PRIMARY_STATE_UNCONFIGURED, true);
   }
 
   return ret;
@@ -239,16 +365,10 @@ rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn
 CascadeLifecycleNode::on_shutdown_internal(
   const rclcpp_lifecycle::State & previous_state)
 {
-  cascade_lifecycle_msgs::msg::State msg;
-
   auto ret = on_shutdown(previous_state);
 
   if (ret == rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn::SUCCESS) {
-    cascade_lifecycle_msgs::msg::State msg;
-    msg.state = lifecycle_msgs::msg::State::PRIMARY_STATE_FINALIZED;
-    msg.node_name = get_name();
-
-    states_pub_->publish(msg);
+    publish_state(lifecycle_msgs::msg::State::PRIMARY_STATE_FINALIZED, true);
   }
 
   return ret;
@@ -258,16 +378,10 @@ rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn
 CascadeLifecycleNode::on_activate_internal(
   const rclcpp_lifecycle::State & previous_state)
 {
-  cascade_lifecycle_msgs::msg::State msg;
-
   auto ret = on_activate(previous_state);
 
   if (ret == rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn::SUCCESS) {
-    cascade_lifecycle_msgs::msg::State msg;
-    msg.state = lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE;
-    msg.node_name = get_name();
-
-    states_pub_->publish(msg);
+    publish_state(lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE, true);
   }
 
   return ret;
@@ -277,16 +391,10 @@ rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn
 CascadeLifecycleNode::on_deactivate_internal(
   const rclcpp_lifecycle::State & previous_state)
 {
-  cascade_lifecycle_msgs::msg::State msg;
-
   auto ret = on_deactivate(previous_state);
 
   if (ret == rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn::SUCCESS) {
-    cascade_lifecycle_msgs::msg::State msg;
-    msg.state = lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE;
-    msg.node_name = get_name();
-
-    states_pub_->publish(msg);
+    publish_state(lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE, true);
   }
 
   return ret;
@@ -296,16 +404,10 @@ rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn
 CascadeLifecycleNode::on_error_internal(
   const rclcpp_lifecycle::State & previous_state)
 {
-  cascade_lifecycle_msgs::msg::State msg;
-
   auto ret = on_error(previous_state);
 
   if (ret == rclcpp_lifecycle::node_interfaces::LifecycleNodeInterface::CallbackReturn::SUCCESS) {
-    cascade_lifecycle_msgs::msg::State msg;
-    msg.state = lifecycle_msgs::msg::State::PRIMARY_STATE_FINALIZED;
-    msg.node_name = get_name();
-
-    states_pub_->publish(msg);
+    publish_state(lifecycle_msgs::msg::State::PRIMARY_STATE_FINALIZED, true);
   }
 
   return ret;
@@ -314,81 +416,100 @@ CascadeLifecycleNode::on_error_internal(
 void
 CascadeLifecycleNode::update_state()
 {
-  bool parent_inactive = false;
-  bool parent_active = false;
-
-  for (const auto & activator : activators_state_) {
-    parent_inactive = parent_inactive ||
-      activator.second == lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE;
-    parent_active = parent_active ||
-      activator.second == lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE;
-  }
-
-  switch (get_current_state().id()) {
-    case lifecycle_msgs::msg::State::PRIMARY_STATE_UNKNOWN:
-      if (parent_active || parent_inactive) {
-        trigger_transition(lifecycle_msgs::msg::Transition::TRANSITION_CONFIGURE);
-      }
-      break;
-
-    case lifecycle_msgs::msg::State::PRIMARY_STATE_UNCONFIGURED:
-      if (parent_active || parent_inactive) {
-        trigger_transition(lifecycle_msgs::msg::Transition::TRANSITION_CONFIGURE);
-      }
-      break;
-
-    case lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE:
-      if (parent_active) {
-        trigger_transition(lifecycle_msgs::msg::Transition::TRANSITION_ACTIVATE);
-      }
+  using State = lifecycle_msgs::msg::State;
+  using Transition = lifecycle_msgs::msg::Transition;
+
+  // Decision table keyed by (current state, activator flags), with flag
+  // bit 1 set when some activator is ACTIVE and bit 0 when some activator
+  // is INACTIVE. A missing entry means no transition applies.
+  static const std::map<std::pair<uint8_t, uint8_t>, uint8_t> transition_table = {
+    {{State::PRIMARY_STATE_UNKNOWN, 0b01}, Transition::TRANSITION_CONFIGURE},
+    {{State::PRIMARY_STATE_UNKNOWN, 0b10}, Transition::TRANSITION_CONFIGURE},
+    {{State::PRIMARY_STATE_UNKNOWN, 0b11}, Transition::TRANSITION_CONFIGURE},
+    {{State::PRIMARY_STATE_UNCONFIGURED, 0b01}, Transition::TRANSITION_CONFIGURE},
+    {{State::PRIMARY_STATE_UNCONFIGURED, 0b10}, Transition::TRANSITION_CONFIGURE},
+    {{State::PRIMARY_STATE_UNCONFIGURED, 0b11}, Transition::TRANSITION_CONFIGURE},
+    {{State::PRIMARY_STATE_INACTIVE, 0b10}, Transition::TRANSITION_ACTIVATE},
+    {{State::PRIMARY_STATE_INACTIVE, 0b11}, Transition::TRANSITION_ACTIVATE},
+    {{State::PRIMARY_STATE_ACTIVE, 0b01}, Transition::TRANSITION_DEACTIVATE},
+  };
+
+  const uint8_t flags =
+    static_cast<uint8_t>((n_activators_active_ > 0 ? 0b10 : 0b00) |
+    (n_activators_inactive_ > 0 ? 0b01 : 0b00));
+
+  // A transition may enable the next one (e.g. UNCONFIGURED -> INACTIVE ->
+  // ACTIVE when the activator is already active). Iterate until no further
+  // transition applies; these chains used to be completed by successive
+  // timer ticks. The chain can only be as long as the table, so cap the
+  // iterations there: a failing user callback can cycle through states
+  // (e.g. INACTIVE -> activate fails -> UNCONFIGURED -> INACTIVE) and an
+  // unbounded loop would spin forever holding mutex_. Leftover progress is
+  // retried on the next GC tick, as the per-tick update always did.
+  uint8_t state = get_current_state().id();
+
+  for (size_t i = 0; i < transition_table.size(); i++) {
+    auto entry = transition_table.find({state, flags});
+    if (entry == transition_table.end()) {
       break;
+    }
 
-    case lifecycle_msgs::msg::State::PRIMARY_STATE_ACTIVE:
-      if (!parent_active && parent_inactive) {
-        trigger_transition(lifecycle_msgs::msg::Transition::TRANSITION_DEACTIVATE);
-      }
-      break;
+    trigger_transition(entry->second);
 
-    case lifecycle_msgs::msg::State::PRIMARY_STATE_FINALIZED:
+    // Stop if the transition did not progress (e.g. a callback failed),
+    // so a rejected transition cannot spin this loop.
+    const uint8_t new_state = get_current_state().id();
+    if (new_state == state) {
       break;
+    }
+    state = new_state;
   }
 }
 
 void
-CascadeLifecycleNode::timer_callback()
+CascadeLifecycleNode::gc_callback()
 {
-  auto nodes = this->get_node_graph_interface()->get_node_names();
-  std::string ns = get_namespace();
-  if (ns != std::string("/")) {
-    ns = ns + std::string("/");
-  }
+  std::lock_guard<std::recursive_mutex> lock(mutex_);
 
-  std::set<std::string>::iterator it = activators_.begin();
-  while (it != activators_.end()) {
-    const auto & node_name = *it;
-    if (std::find(nodes.begin(), nodes.end(), ns + node_name) == nodes.end()) {
-      RCLCPP_DEBUG(
-        get_logger(), "Activator %s is not longer present, removing from activators",
-        node_name.c_str());
-      it = activators_.erase(it);
-
-      if (get_current_state().id() == activators_state_[node_name]) {
-        update_state();
-      }
+  if (graph_event_->check_and_clear() || !graph_node_names_valid_) {
+    const auto nodes = this->get_node_graph_interface()->get_node_names();
+    graph_node_names_ = std::unordered_set<std::string>(nodes.begin(), nodes.end());
+    graph_node_names_valid_ = true;
+  }
 
-      activators_state_.erase(node_name);
-    } else {
-      it++;
+  std::vector<std::string> stale_activators;
+  for (const auto & node_name : activators_) {
+    if (graph_node_names_.find(ns_prefix_ + node_name) == graph_node_names_.end()) {
+      stale_activators.push_back(node_name);
     }
   }
 
-  cascade_lifecycle_msgs::msg::State msg;
-  msg.state = get_current_state().id();
-  msg.node_name = get_name();
+  for (const auto & node_name : stale_activators) {
+    RCLCPP_DEBUG(
+      get_logger(), "Activator %s is not longer present, removing from activators",
+      node_name.c_str());
 
-  states_pub_->publish(msg);
+    erase_activator_state(node_name);
+    activators_.erase(node_name);
+  }
 
+  for (auto it = node_states_.begin(); it != node_states_.end(); ) {
+    if (graph_node_names_.find(ns_prefix_ + it->first) == graph_node_names_.end()) {
+      it = node_states_.erase(it);
+    } else {
+      ++it;
+    }
+  }
+
+  // Re-converge unconditionally: a manual trigger_transition() on this node
+  // changes no activator state and fires no callback above, so the timer is
+  // the only place that pulls the node back to its activators' state. Cheap
+  // now that update_state() reads the counters instead of scanning the map.
   update_state();
+
+  // Fallback for state changes that did not go through the registered
+  // transition callbacks; a no-op while the latched sample is up to date.
+  publish_state(get_current_state().id());
 }
 
 }  // namespace rclcpp_cascade_lifecycle
@@ -1880,6 +1880,91 @@ TEST(rclcpp_cascade_lifecycle, inheritance_with_namespace)
   ASSERT_EQ(node_2->get_my_state(), lifecycle_msgs::msg::State::PRIMARY_STATE_INACTIVE);
 }
 
+TEST(rclcpp_cascade_lifecycle, repeated_add_activation)
+{
+  auto node_a = std::make_shared<rclcpp_cascade_lifecycle::CascadeLifecycleNode>("node_A");
+  auto node_b = std::make_shared<rclcpp_cascade_lifecycle::CascadeLifecycleNode>("node_B");
+
+  rclcpp::executors::SingleThreadedExecutor executor;
+  executor.add_node(node_a->get_node_base_interface());
+  executor.add_node(node_b->get_node_base_interface());
+
+  node_a->add_activation("node_B");
+  node_a->add_activation("node_B");
+  node_a->add_activation("node_B");
+
+  {
+    rclcpp::Rate rate(10);
+    auto start = node_a->now();
+    while ((node_a->now() - start).seconds() < 1.0) {
+      executor.spin_some();
+      rate.sleep();
+    }
+  }
+
+  ASSERT_EQ(node_a->get_activations().size(), 1u);
+  ASSERT_EQ(node_b->get_activators().size(), 1u);
+  ASSERT_EQ(node_b->get_activators_state().size(), 1u);
+
+  node_a->remove_activation("node_B");
+
+  {
+    rclcpp::Rate rate(10);
+    auto start = node_a->now();
+    while ((node_a->now() - start).seconds() < 1.0) {
+      executor.spin_some();
+      rate.sleep();
+    }
+  }
+
+  ASSERT_TRUE(node_a->get_activations().empty());
+  ASSERT_TRUE(node_b->get_activators().empty());
+  ASSERT_TRUE(node_b->get_activators_state().empty());
+}
+
+TEST(rclcpp_cascade_lifecycle, clear_activation)
+{
+  auto node_a = std::make_shared<rclcpp_cascade_lifecycle::CascadeLifecycleNode>("node_A");
+  auto node_b = std::make_shared<rclcpp_cascade_lifecycle::CascadeLifecycleNode>("node_B");
+  auto node_c = std::make_shared<rclcpp_cascade_lifecycle::CascadeLifecycleNode>("node_C");
+
+  rclcpp::executors::SingleThreadedExecutor executor;
+  executor.add_node(node_a->get_node_base_interface());
+  executor.add_node(node_b->get_node_base_interface());
+  executor.add_node(node_c->get_node_base_interface());
+
+  node_a->add_activation("node_B");
+  node_a->add_activation("node_C");
+
+  {
+    rclcpp::Rate rate(10);
+    auto start = node_a->now();
+    while ((node_a->now() - start).seconds() < 1.0) {
+      executor.spin_some();
+      rate.sleep();
+    }
+  }
+
+  ASSERT_EQ(node_a->get_activations().size(), 2u);
+  ASSERT_EQ(node_b->get_activators().size(), 1u);
+  ASSERT_EQ(node_c->get_activators().size(), 1u);
+
+  node_a->clear_activation();
+
+  {
+    rclcpp::Rate rate(10);
+    auto start = node_a->now();
+    while ((node_a->now() - start).seconds() < 1.0) {
+      executor.spin_some();
+      rate.sleep();
+    }
+  }
+
+  ASSERT_TRUE(node_a->get_activations().empty());
+  ASSERT_TRUE(node_b->get_activators().empty());
+  ASSERT_TRUE(node_c->get_activators().empty());
+}
+
 int main(int argc, char ** argv)
 {
   rclcpp::init(argc, argv);